@@ -8,63 +8,78 @@ Demonstrates:
 
 import asyncio
 import os
+import sys
+import traceback
 from dotenv import load_dotenv
 
+# Use uvloop's faster event loop when available (it is not supported on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 load_dotenv()
 
-from agents.extraction_agent import ExtractionAgent
-from agents.library_agent import LibraryAgent
-from agents.validation_agent import ValidationAgent
-from agents.memory_service import SimpleMemoryService
-from tools.agent_tools import validate_music_data, get_music_statistics
+# Agents and tools are imported inside each example so that running one
+# example only loads the modules it needs.
+
+# Sample music data shared by the examples. The tools only read it, so the
+# examples pass it directly rather than each building their own copy.
+SAMPLE_DATA = {
+    "key": "C Major",
+    "tempo": "120",
+    "measures": [
+        {
+            "id": 1,
+            "right_hand": [
+                {"notes": ["C4", "E4"], "duration": "quarter"},
+                {"notes": ["G4"], "duration": "quarter"}
+            ],
+            "left_hand": [
+                {"notes": ["C3"], "duration": "half"}
+            ]
+        }
+    ]
+}
 
 
 async def example_function_tools():
     """Example: Using function tools directly"""
-    print("=" * 80)
-    print("EXAMPLE 1: Using Function Tools Directly")
-    print("=" * 80)
-    
-    # Sample music data
-    sample_data = {
-        "key": "C Major",
-        "tempo": "120",
-        "measures": [
-            {
-                "id": 1,
-                "right_hand": [
-                    {"notes": ["C4", "E4"], "duration": "quarter"},
-                    {"notes": ["G4"], "duration": "quarter"}
-                ],
-                "left_hand": [
-                    {"notes": ["C3"], "duration": "half"}
-                ]
-            }
-        ]
-    }
+    from tools.agent_tools import validate_music_data, get_music_statistics
+
+    out = []
+    out.append("=" * 80)
+    out.append("EXAMPLE 1: Using Function Tools Directly")
+    out.append("=" * 80)
     
     # Use validation tool
-    print("\n1. Validating music data...")
-    validation = validate_music_data(sample_data)
-    print(f"   Valid: {validation.get('valid')}")
-    print(f"   Errors: {validation.get('errors', [])}")
-    print(f"   Warnings: {validation.get('warnings', [])}")
+    out.append("\n1. Validating music data...")
+    validation = validate_music_data(SAMPLE_DATA)
+    out.append(f"   Valid: {validation.get('valid')}")
+    out.append(f"   Errors: {validation.get('errors', [])}")
+    out.append(f"   Warnings: {validation.get('warnings', [])}")
     
     # Use statistics tool
-    print("\n2. Getting music statistics...")
-    stats = get_music_statistics(sample_data)
+    out.append("\n2. Getting music statistics...")
+    stats = get_music_statistics(SAMPLE_DATA)
     if stats.get('status') == 'success':
         s = stats.get('statistics', {})
-        print(f"   Key: {s.get('key')}")
-        print(f"   Measures: {s.get('measure_count')}")
-        print(f"   Unique Pitches: {s.get('unique_pitches', [])}")
+        out.append(f"   Key: {s.get('key')}")
+        out.append(f"   Measures: {s.get('measure_count')}")
+        out.append(f"   Unique Pitches: {s.get('unique_pitches', [])}")
+    return out
 
 
 async def example_agent_with_tools():
     """Example: Agent using tools automatically"""
-    print("\n" + "=" * 80)
-    print("EXAMPLE 2: Agent with Tools")
-    print("=" * 80)
+    from agents.extraction_agent import ExtractionAgent
+    from agents.library_agent import LibraryAgent
+    from agents.memory_service import SimpleMemoryService
+
+    out = []
+    out.append("\n" + "=" * 80)
+    out.append("EXAMPLE 2: Agent with Tools")
+    out.append("=" * 80)
     
     memory_service = SimpleMemoryService()
     library = LibraryAgent(memory_service=memory_service)
@@ -76,26 +91,32 @@ async def example_agent_with_tools():
         enable_tools=True
     )
     
-    print("\nExtractionAgent created with tools:")
-    print(f"  - validate_music_data")
-    print(f"  - get_music_statistics")
-    print(f"  - get_note_frequency")
-    print(f"  - suggest_corrections")
-    print(f"  - get_user_preferences")
+    out.append("\nExtractionAgent created with tools:")
+    out.append(f"  - validate_music_data")
+    out.append(f"  - get_music_statistics")
+    out.append(f"  - get_note_frequency")
+    out.append(f"  - suggest_corrections")
+    out.append(f"  - get_user_preferences")
     
-    print("\nThe agent can now use these tools during extraction to:")
-    print("  - Validate extracted data")
-    print("  - Calculate statistics")
-    print("  - Get note frequencies")
-    print("  - Suggest corrections")
-    print("  - Access user preferences")
+    out.append("\nThe agent can now use these tools during extraction to:")
+    out.append("  - Validate extracted data")
+    out.append("  - Calculate statistics")
+    out.append("  - Get note frequencies")
+    out.append("  - Suggest corrections")
+    out.append("  - Access user preferences")
+    return out
 
 
 async def example_sub_agent():
     """Example: Using ValidationAgent as a sub-agent"""
-    print("\n" + "=" * 80)
-    print("EXAMPLE 3: Sub-Agent for Validation")
-    print("=" * 80)
+    from agents.library_agent import LibraryAgent
+    from agents.validation_agent import ValidationAgent
+    from agents.memory_service import SimpleMemoryService
+
+    out = []
+    out.append("\n" + "=" * 80)
+    out.append("EXAMPLE 3: Sub-Agent for Validation")
+    out.append("=" * 80)
     
     memory_service = SimpleMemoryService()
     library = LibraryAgent(memory_service=memory_service)
@@ -103,37 +124,27 @@ async def example_sub_agent():
     # Create validation agent
     validator = ValidationAgent(library_agent=library)
     
-    # Sample data to validate
-    sample_data = {
-        "key": "C Major",
-        "tempo": "120",
-        "measures": [
-            {
-                "id": 1,
-                "right_hand": [
-                    {"notes": ["C4", "E4"], "duration": "quarter"}
-                ],
-                "left_hand": [
-                    {"notes": ["C3"], "duration": "half"}
-                ]
-            }
-        ]
-    }
-    
-    print("\nValidating music data with ValidationAgent...")
-    result = await validator.validate(sample_data, user_id="test_user")
-    
-    print(f"\nValidation Results:")
-    print(f"  Valid: {result.get('is_valid')}")
-    print(f"  Statistics: {result.get('statistics', {}).get('measure_count')} measures")
-    print(f"  Suggestions: {len(result.get('suggestions', {}))} suggestions")
+    out.append("\nValidating music data with ValidationAgent...")
+    result = await validator.validate(SAMPLE_DATA, user_id="test_user")
+    
+    out.append(f"\nValidation Results:")
+    out.append(f"  Valid: {result.get('is_valid')}")
+    out.append(f"  Statistics: {result.get('statistics', {}).get('measure_count')} measures")
+    out.append(f"  Suggestions: {len(result.get('suggestions', {}))} suggestions")
+    return out
 
 
 async def example_multi_agent_workflow():
     """Example: Multi-agent workflow with extraction and validation"""
-    print("\n" + "=" * 80)
-    print("EXAMPLE 4: Multi-Agent Workflow")
-    print("=" * 80)
+    from agents.extraction_agent import ExtractionAgent
+    from agents.library_agent import LibraryAgent
+    from agents.validation_agent import ValidationAgent
+    from agents.memory_service import SimpleMemoryService
+
+    out = []
+    out.append("\n" + "=" * 80)
+    out.append("EXAMPLE 4: Multi-Agent Workflow")
+    out.append("=" * 80)
     
     memory_service = SimpleMemoryService()
     library = LibraryAgent(memory_service=memory_service)
@@ -148,24 +159,39 @@ async def example_multi_agent_workflow():
     # Create validation agent
     validator = ValidationAgent(library_agent=library)
     
-    print("\nMulti-agent workflow:")
-    print("  1. ExtractionAgent extracts music data from sheet")
-    print("  2. ExtractionAgent uses tools to validate internally")
-    print("  3. ValidationAgent performs additional validation")
-    print("  4. Both agents can access shared memory and preferences")
+    out.append("\nMulti-agent workflow:")
+    out.append("  1. ExtractionAgent extracts music data from sheet")
+    out.append("  2. ExtractionAgent uses tools to validate internally")
+    out.append("  3. ValidationAgent performs additional validation")
+    out.append("  4. Both agents can access shared memory and preferences")
     
     # Note: In a real scenario, you would:
     # 1. Extract with extractor.extract(file_path)
     # 2. Validate with validator.validate(extracted_data)
     # 3. Use results to improve extraction
+    return out
 
 
 async def main():
     """Run all examples"""
-    await example_function_tools()
-    await example_agent_with_tools()
-    await example_sub_agent()
-    await example_multi_agent_workflow()
+    # The examples are independent, so run them concurrently. Each one
+    # buffers its own output and returns it, so we can still print the
+    # results in order once everything has finished.
+    results = await asyncio.gather(
+        example_function_tools(),
+        example_agent_with_tools(),
+        example_sub_agent(),
+        example_multi_agent_workflow(),
+        return_exceptions=True
+    )
+    failed = False
+    for result in results:
+        if isinstance(result, BaseException):
+            failed = True
+            print(f"\nExample failed: {result!r}", file=sys.stderr)
+            traceback.print_exception(result)
+        else:
+            sys.stdout.write("\n".join(result) + "\n")
     
     print("\n" + "=" * 80)
     print("Examples complete!")
@@ -176,7 +202,13 @@ async def main():
     print("  - Agents can use tools automatically during generation")
     print("  - Multiple agents can share memory and preferences")
 
+    if failed:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
 
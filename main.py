@@ -1,12 +1,19 @@
 import os
+import re
 import argparse
 import asyncio
 import warnings
 import sys
-from io import StringIO
+import functools
 from contextlib import contextmanager
 from dotenv import load_dotenv
 
+# Use uvloop's faster event loop when available (it is not supported on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -14,35 +21,65 @@ load_dotenv()
 warnings.filterwarnings('ignore', message='.*non-text parts.*function_call.*')
 warnings.filterwarnings('ignore', message='.*returning concatenated text result.*')
 
+# Stderr messages from google.genai that are filtered out
+_SUPPRESS_RE = re.compile("|".join(re.escape(msg) for msg in (
+    'Warning: there are non-text parts in the response',
+    'returning concatenated text result from text parts',
+    'Check the full candidates.content.parts accessor',
+)))
+
+
+def _max_concurrency(default=4):
+    """Read SCORE_READER_MAX_CONCURRENCY, falling back to a sane value if it is invalid."""
+    value = os.getenv("SCORE_READER_MAX_CONCURRENCY")
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        print(f"Warning: SCORE_READER_MAX_CONCURRENCY must be an integer, got {value!r}; using {default}",
+              file=sys.stderr)
+        return default
+    if limit < 1:
+        print(f"Warning: SCORE_READER_MAX_CONCURRENCY must be at least 1, got {limit}; using 1",
+              file=sys.stderr)
+        return 1
+    return limit
+
+
+# Upper bound on concurrent LLM requests (and the file uploads that feed them)
+_LLM_SEM = asyncio.Semaphore(_max_concurrency())
+
+# Streamed reply text is written to stdout once this many bytes are buffered
+_STREAM_FLUSH_BYTES = 256
+
+
+class FilteredStderr:
+    """Stderr wrapper that drops the google.genai function_call warnings."""
+    __slots__ = ("original",)
+
+    def __init__(self, original):
+        self.original = original
+    
+    def write(self, text):
+        # Filter out the specific warning messages
+        if _SUPPRESS_RE.search(text):
+            return
+        # Write everything else to original stderr
+        self.original.write(text)
+    
+    def flush(self):
+        self.original.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self.original, name)
+
+
 # Context manager to filter stderr warnings from google.genai
 @contextmanager
 def suppress_genai_warnings():
     """Suppress warnings from google.genai about function_call parts."""
     original_stderr = sys.stderr
-    filtered_stderr = StringIO()
-    
-    class FilteredStderr:
-        def __init__(self, original):
-            self.original = original
-            self.buffer = []
-        
-        def write(self, text):
-            # Filter out the specific warning messages
-            if 'Warning: there are non-text parts in the response' in text:
-                return
-            if 'returning concatenated text result from text parts' in text:
-                return
-            if 'Check the full candidates.content.parts accessor' in text:
-                return
-            # Write everything else to original stderr
-            self.original.write(text)
-        
-        def flush(self):
-            self.original.flush()
-        
-        def __getattr__(self, name):
-            return getattr(self.original, name)
-    
     sys.stderr = FilteredStderr(original_stderr)
     try:
         yield
@@ -50,24 +87,110 @@ def suppress_genai_warnings():
         sys.stderr = original_stderr
 
 
-async def run_music_assistant(args):
-    """Run the Music Assistant Agent (interactive chat mode)."""
-    from google.adk.runners import Runner
-    from google.adk.sessions.in_memory_session_service import InMemorySessionService
+def enable_eager_tasks():
+    """Run new tasks eagerly on the current loop (Python 3.12+ only)."""
+    if hasattr(asyncio, "eager_task_factory"):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
+
+# MIME types for supported uploads, keyed by lowercase file extension
+_MIME_BY_EXT = {
+    ".png": "image/png",
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+}
+
+
+def _mime(path):
+    """Return the upload MIME type for a path, defaulting to JPEG."""
+    return _MIME_BY_EXT.get(os.path.splitext(path)[1].lower(), "image/jpeg")
+
+
+def _sync_load_file(path):
+    """Read a file and return its (mime_type, raw bytes)."""
+    mime_type = _mime(path)
+    with open(path, 'rb') as f:
+        return mime_type, f.read()
+
+
+async def _load_file(path):
+    """Read a file in a worker thread so the event loop stays responsive."""
+    return await asyncio.to_thread(_sync_load_file, path)
+
+
+# Bytes read from stdin by _ainput that are not yet part of a returned line
+_stdin_pending = bytearray()
+
+
+async def _read_stdin_chunk(loop, fd):
+    """Wait until fd is readable and return whatever bytes are available (b"" at EOF)."""
+    chunk = loop.create_future()
+
+    def on_readable():
+        if chunk.done():
+            return
+        try:
+            chunk.set_result(os.read(fd, 4096))
+        except OSError as e:
+            chunk.set_exception(e)
+
+    loop.add_reader(fd, on_readable)
+    try:
+        return await chunk
+    finally:
+        loop.remove_reader(fd)
+
+
+async def _ainput(prompt=""):
+    """Read a line from stdin without blocking the event loop.
+
+    Where the loop can watch stdin (POSIX ttys and pipes) the raw bytes are
+    read as they arrive and split into lines here, so neither a partial line
+    nor cancelling the wait blocks anything. Otherwise (Windows, regular
+    files) the read falls back to a worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        fd = sys.stdin.fileno()
+        loop.add_reader(fd, lambda: None)
+        loop.remove_reader(fd)
+    except (AttributeError, OSError, ValueError, NotImplementedError):
+        return await asyncio.to_thread(input, prompt)
+
+    encoding = getattr(sys.stdin, "encoding", None) or "utf-8"
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    while True:
+        end = _stdin_pending.find(b"\n")
+        if end >= 0:
+            line = bytes(_stdin_pending[:end])
+            del _stdin_pending[:end + 1]
+            return line.decode(encoding, "replace")
+        data = await _read_stdin_chunk(loop, fd)
+        if not data:
+            # EOF: hand back a final unterminated line, like input() does
+            if _stdin_pending:
+                line = bytes(_stdin_pending)
+                _stdin_pending.clear()
+                return line.decode(encoding, "replace")
+            raise EOFError
+        _stdin_pending.extend(data)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_music_assistant_services():
+    """Build the Music Assistant app and memory service once and reuse them."""
     from google.adk.memory import InMemoryMemoryService
     from google.adk.apps.app import App, ResumabilityConfig
     from agents.music_assistant import MusicAssistantAgent
     from agents.library_agent import LibraryAgent
     from tools.library_manager import LibraryManager
-    from google.genai import types
-    import base64
 
-    # Initialize services
     library_manager = LibraryManager()
     library_agent = LibraryAgent(library_manager=library_manager, output_key="response")
     memory_service = InMemoryMemoryService()
     root_agent = MusicAssistantAgent(library_agent=library_agent)
-    session_service = InMemorySessionService()
     
     # Create App wrapper with correct name to avoid app name mismatch warning
     music_assistant = App(
@@ -75,6 +198,79 @@ async def run_music_assistant(args):
         root_agent=root_agent,
         resumability_config=ResumabilityConfig(is_resumable=True),
     )
+    return music_assistant, memory_service
+
+
+def _flush_stream_buffer(buf, encoding):
+    """Write buffered reply bytes to stdout in one go and clear the buffer."""
+    raw = getattr(sys.stdout, "buffer", None)
+    if raw is not None:
+        raw.write(buf)
+        raw.flush()
+    else:
+        sys.stdout.write(buf.decode(encoding, "replace"))
+        sys.stdout.flush()
+    buf.clear()
+
+
+async def _run_turn(runner, user_id, session_id, text, file_path=None):
+    """Send one message (plus an optional file) to the runner and stream the reply."""
+    from google.genai.types import Blob, Content, Part
+
+    async with _LLM_SEM:
+        # Build message parts
+        parts = [Part(text=text)]
+        
+        # Add file if provided
+        if file_path:
+            print(f"📎 Uploading file: {file_path}")
+            mime_type, file_data = await _load_file(file_path)
+            
+            # Add inline data part
+            parts.append(Part(
+                inline_data=Blob(
+                    mime_type=mime_type,
+                    data=file_data
+                )
+            ))
+        
+        print("\nAssistant > ", end="", flush=True)
+        encoding = getattr(sys.stdout, "encoding", None) or "utf-8"
+        buf = bytearray()
+        try:
+            with suppress_genai_warnings():
+                async for event in runner.run_async(
+                    user_id=user_id,
+                    session_id=session_id,
+                    new_message=Content(parts=parts)
+                ):
+                    # Print the event content - only text parts, ignore function calls
+                    parts_out = getattr(getattr(event, 'content', None), 'parts', None)
+                    if parts_out:
+                        for part in parts_out:
+                            chunk = getattr(part, 'text', None)
+                            if chunk:
+                                buf.extend(chunk.encode(encoding, "replace"))
+                            # Skip function_call parts silently
+                    # Partial (streamed) events are batched; anything else ends a chunk of output
+                    if buf and (len(buf) > _STREAM_FLUSH_BYTES or not getattr(event, 'partial', False)):
+                        _flush_stream_buffer(buf, encoding)
+        finally:
+            if buf:
+                _flush_stream_buffer(buf, encoding)
+        print()  # New line after response
+
+
+async def run_music_assistant(args):
+    """Run the Music Assistant Agent (interactive chat mode)."""
+    from google.adk.runners import Runner
+    from google.adk.sessions.in_memory_session_service import InMemorySessionService
+
+    enable_eager_tasks()
+
+    # Initialize services; sessions are per run, the agents are shared
+    music_assistant, memory_service = _get_music_assistant_services()
+    session_service = InMemorySessionService()
     
     # Create Runner with App wrapper
     runner = Runner(
@@ -97,7 +293,7 @@ async def run_music_assistant(args):
         
         while True:
             try:
-                user_input = input("\nUser > ")
+                user_input = await _ainput("\nUser > ")
                 if user_input.lower() in ['exit', 'quit']:
                     break
                 
@@ -106,46 +302,10 @@ async def run_music_assistant(args):
                 if user_input.lower().startswith('upload '):
                     file_path = user_input[7:].strip()
                     user_input = f"Please convert this music sheet image to MusicXML. File path: {file_path}"
+                    if not os.path.exists(file_path):
+                        file_path = None
                 
-                # Build message parts
-                parts = [types.Part(text=user_input)]
-                
-                # Add file if provided
-                if file_path and os.path.exists(file_path):
-                    print(f"📎 Uploading file: {file_path}")
-                    with open(file_path, 'rb') as f:
-                        file_data = f.read()
-                    
-                    # Determine MIME type
-                    mime_type = "image/jpeg"
-                    if file_path.lower().endswith('.png'):
-                        mime_type = "image/png"
-                    elif file_path.lower().endswith('.pdf'):
-                        mime_type = "application/pdf"
-                    
-                    # Add inline data part
-                    parts.append(types.Part(
-                        inline_data=types.Blob(
-                            mime_type=mime_type,
-                            data=base64.b64encode(file_data).decode('utf-8')
-                        )
-                    ))
-                
-                print("\nAssistant > ", end="", flush=True)
-                with suppress_genai_warnings():
-                    async for event in runner.run_async(
-                        user_id=user_id,
-                        session_id=session_id,
-                        new_message=types.Content(parts=parts)
-                    ):
-                        # Print the event content - only text parts, ignore function calls
-                        if hasattr(event, 'content') and event.content:
-                            if hasattr(event.content, 'parts') and event.content.parts:
-                                for part in event.content.parts:
-                                    if hasattr(part, 'text') and part.text:
-                                        print(part.text, end="", flush=True)
-                                    # Skip function_call parts silently
-                print()  # New line after response
+                await _run_turn(runner, user_id, session_id, user_input, file_path)
                 
             except KeyboardInterrupt:
                 break
@@ -162,50 +322,12 @@ async def run_music_assistant(args):
             # Create session
             await session_service.create_session(app_name="MusicAssistant", session_id=session_id, user_id=user_id)
             
-            # Build message
-            query_text = args.query if args.query else "I'm uploading a music sheet. Please convert it to MusicXML."
-            parts = [types.Part(text=query_text)]
-            
-            # Add file if provided
-            if args.file:
-                if not os.path.exists(args.file):
-                    print(f"Error: File not found: {args.file}")
-                    return
-                
-                print(f"📎 Uploading file: {args.file}")
-                with open(args.file, 'rb') as f:
-                    file_data = f.read()
-                
-                # Determine MIME type
-                mime_type = "image/jpeg"
-                if args.file.lower().endswith('.png'):
-                    mime_type = "image/png"
-                elif args.file.lower().endswith('.pdf'):
-                    mime_type = "application/pdf"
-                
-                # Add inline data part
-                parts.append(types.Part(
-                    inline_data=types.Blob(
-                        mime_type=mime_type,
-                        data=base64.b64encode(file_data).decode('utf-8')
-                    )
-                ))
+            if args.file and not os.path.exists(args.file):
+                print(f"Error: File not found: {args.file}")
+                return
             
-            print("\nAssistant > ", end="", flush=True)
-            with suppress_genai_warnings():
-                async for event in runner.run_async(
-                    user_id=user_id,
-                    session_id=session_id,
-                    new_message=types.Content(parts=parts)
-                ):
-                    # Print the event content - only text parts, ignore function calls
-                    if hasattr(event, 'content') and event.content:
-                        if hasattr(event.content, 'parts') and event.content.parts:
-                            for part in event.content.parts:
-                                if hasattr(part, 'text') and part.text:
-                                    print(part.text, end="", flush=True)
-                                # Skip function_call parts silently
-            print()  # New line after response
+            query_text = args.query if args.query else "I'm uploading a music sheet. Please convert it to MusicXML."
+            await _run_turn(runner, user_id, session_id, query_text, args.file)
         except Exception as e:
             print(f"\nError: {e}")
             import traceback
@@ -215,14 +337,100 @@ async def run_music_assistant(args):
         print("Use --interactive for chat mode, or provide a query/--file for single query mode.")
 
 
+def _play_measures(state, start, end):
+    """Play a measure range with the session's current hands and tempo."""
+    state["player"].play(state["data"], hands=state["hands"], tempo_override=state["tempo"], measure_range=(start, end))
+
+
+def _do_play(args, state):
+    """Handle 'play', 'play [n]' and 'play [start]-[end]'."""
+    if args:
+        rng = args[0]
+        if '-' in rng:
+            try:
+                s, e = map(int, rng.split('-'))
+                _play_measures(state, s, e)
+                state["measure"] = e
+            except Exception:
+                print("Invalid range.")
+        else:
+            try:
+                m = int(rng)
+                _play_measures(state, m, m)
+                state["measure"] = m
+            except Exception:
+                print("Invalid measure number.")
+    else:
+        # Play all from current
+        _play_measures(state, state["measure"], state["total_measures"])
+
+
+def _do_next(args, state):
+    """Handle 'next': step forward one measure and play it."""
+    if state["measure"] < state["total_measures"]:
+        state["measure"] += 1
+        _play_measures(state, state["measure"], state["measure"])
+    else:
+        print("End of piece.")
+
+
+def _do_prev(args, state):
+    """Handle 'prev': step back one measure and play it."""
+    if state["measure"] > 1:
+        state["measure"] -= 1
+        _play_measures(state, state["measure"], state["measure"])
+    else:
+        print("Already at start.")
+
+
+def _do_tempo(args, state):
+    """Handle 'tempo [bpm]' and save it as the preferred tempo."""
+    try:
+        state["tempo"] = int(args[0])
+        # Save tempo preference
+        state["library"].update_preference('tempo', state["tempo"], state["user_id"])
+        print(f"Tempo set to {state['tempo']} (preference saved)")
+    except Exception:
+        print("Invalid tempo.")
+
+
+def _do_hand(args, state):
+    """Handle 'hand [left/right/both]' and save it as the preferred hand."""
+    h = args[0] if args else None
+    if h in ['left', 'right', 'both']:
+        if h == 'both': state["hands"] = ['left', 'right']
+        else: state["hands"] = [h]
+        # Save hand preference
+        state["library"].update_preference('hand', h, state["user_id"])
+        print(f"Hand set to {h} (preference saved)")
+    else:
+        print("Invalid hand. Use left, right, or both.")
+
+
+def _do_exit(args, state):
+    """Handle 'exit': end the session."""
+    return True
+
+
+# Interactive playback commands for the extraction workflow. Each handler
+# takes the command's arguments and the session state; returning True ends
+# the session.
+_HANDLERS = {
+    "play": _do_play,
+    "next": _do_next,
+    "prev": _do_prev,
+    "tempo": _do_tempo,
+    "hand": _do_hand,
+    "exit": _do_exit,
+}
+
+
 async def run_extraction_workflow(args):
     """Run the extraction workflow with audio playback (legacy mode)."""
-    from agents.extraction_agent import ExtractionAgent
-    from tools.library_manager import LibraryManager as LibraryAgent
-    from tools.correction_tool import CorrectionTool
-    from tools.audio_tool import AudioTool
     from tools.evaluation_system import EvaluationSystem
 
+    enable_eager_tasks()
+
     # Show evaluation summary if requested
     if args.eval_summary:
         evaluator = EvaluationSystem()
@@ -256,6 +464,13 @@ async def run_extraction_workflow(args):
         print("Error: file_path is required")
         return
 
+    # Imported only now so --eval-summary and the voice modes don't pay for
+    # google.adk (pulled in by ExtractionAgent) or the audio stack
+    from agents.extraction_agent import ExtractionAgent
+    from tools.library_manager import LibraryManager as LibraryAgent
+    from tools.correction_tool import CorrectionTool
+    from tools.audio_tool import AudioTool
+
     print(f"Processing file: {args.file_path}")
     print(f"User ID: {args.user_id}")
 
@@ -268,20 +483,21 @@ async def run_extraction_workflow(args):
     corrector = CorrectionTool(library_agent=library, user_id=args.user_id)
     evaluator = EvaluationSystem(library_agent=library)
     
-    # Check Library
-    music_data = library.get_cached_data(args.file_path)
+    # Check Library (hashes the file and reads the cache, so keep it off the loop)
+    music_data = await asyncio.to_thread(library.get_cached_data, args.file_path)
 
     if not music_data:
         # 1. Extraction with memory
         print("Extracting with memory-enabled agent...")
-        music_data = await extractor.extract(args.file_path, user_id=args.user_id)
+        async with _LLM_SEM:
+            music_data = await extractor.extract(args.file_path, user_id=args.user_id)
         
         if not music_data:
             print("Failed to extract music data.")
             return
         
         # Save to library with user context
-        library.save_to_library(args.file_path, music_data, user_id=args.user_id)
+        await asyncio.to_thread(library.save_to_library, args.file_path, music_data, user_id=args.user_id)
     else:
         print("Loaded from library.")
 
@@ -290,10 +506,12 @@ async def run_extraction_workflow(args):
     # 2. Human-in-the-loop Correction with preference learning
     corrected_data = corrector.review_and_correct(music_data, user_id=args.user_id)
     
-    # Learn from corrections
+    # Learn from corrections (independent of each other, so run them together)
     if corrected_data != music_data:
-        extractor.learn_from_correction(music_data, corrected_data, args.user_id)
-        library.record_correction_pattern(music_data, corrected_data, args.user_id)
+        await asyncio.gather(
+            asyncio.to_thread(extractor.learn_from_correction, music_data, corrected_data, args.user_id),
+            asyncio.to_thread(library.record_correction_pattern, music_data, corrected_data, args.user_id)
+        )
     
     print("Correction complete.")
     
@@ -326,77 +544,34 @@ async def run_extraction_workflow(args):
         print("\n--- Interactive Session ---")
         print("Commands: play [n], play [start]-[end], next, prev, tempo [bpm], hand [left/right/both], exit")
         
-        current_measure = 1
         total_measures = len(corrected_data.get('measures', []))
         if total_measures == 0:
              # Fallback for legacy notes
              total_measures = 1
              
-        current_tempo = args.tempo
         current_hands = ['left', 'right']
         if args.hand == 'left': current_hands = ['left']
         elif args.hand == 'right': current_hands = ['right']
 
+        state = {
+            "player": player,
+            "data": corrected_data,
+            "library": library,
+            "user_id": args.user_id,
+            "measure": 1,
+            "total_measures": total_measures,
+            "tempo": args.tempo,
+            "hands": current_hands,
+        }
+
         while True:
-            cmd = input(f"(Measure {current_measure}/{total_measures}) > ").strip().lower()
+            tokens = (await _ainput(f"(Measure {state['measure']}/{total_measures}) > ")).strip().lower().split()
+            verb = tokens[0] if tokens else ""
             
-            if cmd == 'exit':
-                break
-            elif cmd.startswith('play'):
-                parts = cmd.split()
-                if len(parts) > 1:
-                    rng = parts[1]
-                    if '-' in rng:
-                        try:
-                            s, e = map(int, rng.split('-'))
-                            player.play(corrected_data, hands=current_hands, tempo_override=current_tempo, measure_range=(s, e))
-                            current_measure = e
-                        except:
-                            print("Invalid range.")
-                    else:
-                        try:
-                            m = int(rng)
-                            player.play(corrected_data, hands=current_hands, tempo_override=current_tempo, measure_range=(m, m))
-                            current_measure = m
-                        except:
-                            print("Invalid measure number.")
-                else:
-                    # Play all from current
-                    player.play(corrected_data, hands=current_hands, tempo_override=current_tempo, measure_range=(current_measure, total_measures))
-            
-            elif cmd == 'next':
-                if current_measure < total_measures:
-                    current_measure += 1
-                    player.play(corrected_data, hands=current_hands, tempo_override=current_tempo, measure_range=(current_measure, current_measure))
-                else:
-                    print("End of piece.")
-            
-            elif cmd == 'prev':
-                if current_measure > 1:
-                    current_measure -= 1
-                    player.play(corrected_data, hands=current_hands, tempo_override=current_tempo, measure_range=(current_measure, current_measure))
-                else:
-                    print("Already at start.")
-            
-            elif cmd.startswith('tempo'):
-                try:
-                    current_tempo = int(cmd.split()[1])
-                    # Save tempo preference
-                    library.update_preference('tempo', current_tempo, args.user_id)
-                    print(f"Tempo set to {current_tempo} (preference saved)")
-                except:
-                    print("Invalid tempo.")
-            
-            elif cmd.startswith('hand'):
-                h = cmd.split()[1]
-                if h in ['left', 'right', 'both']:
-                    if h == 'both': current_hands = ['left', 'right']
-                    else: current_hands = [h]
-                    # Save hand preference
-                    library.update_preference('hand', h, args.user_id)
-                    print(f"Hand set to {h} (preference saved)")
-                else:
-                    print("Invalid hand. Use left, right, or both.")
+            handler = _HANDLERS.get(verb)
+            if handler:
+                if handler(tokens[1:], state):
+                    break
             else:
                 print("Unknown command.")
         
@@ -458,13 +633,21 @@ Examples:
     args = parser.parse_args()
     
     # Determine mode based on arguments
-    if args.file_path or args.split_voice or args.clone_voice or args.eval_summary:
-        # Extraction workflow mode
-        await run_extraction_workflow(args)
-    else:
-        # Music Assistant mode (default)
-        await run_music_assistant(args)
+    match (bool(args.file_path), bool(args.split_voice or args.clone_voice or args.eval_summary)):
+        case (True, _) | (_, True):
+            # Extraction workflow mode
+            await run_extraction_workflow(args)
+        case _:
+            # Music Assistant mode (default)
+            await run_music_assistant(args)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
+    except KeyboardInterrupt:
+        # Ctrl-C at a prompt cancels the main task; exit quietly
+        pass
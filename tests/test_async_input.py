@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import main
+
+
+class TestAsyncInput(unittest.TestCase):
+    def setUp(self):
+        main._stdin_pending.clear()
+        self.read_fd, self.write_fd = os.pipe()
+        self.stdin = os.fdopen(self.read_fd, 'r')
+
+    def tearDown(self):
+        self.stdin.close()
+        try:
+            os.close(self.write_fd)
+        except OSError:
+            pass
+        main._stdin_pending.clear()
+
+    def _read_lines(self, count):
+        async def read():
+            return [await asyncio.wait_for(main._ainput(), 2) for _ in range(count)]
+        with patch('sys.stdin', self.stdin), patch('sys.stdout'):
+            return asyncio.run(read())
+
+    def test_two_lines_in_one_write(self):
+        # Both lines arrive together and the pipe stays open
+        os.write(self.write_fd, b"play 1\nnext\n")
+        self.assertEqual(self._read_lines(2), ["play 1", "next"])
+
+    def test_line_split_across_writes(self):
+        os.write(self.write_fd, b"tem")
+
+        async def read():
+            pending = asyncio.ensure_future(main._ainput())
+            await asyncio.sleep(0.1)
+            self.assertFalse(pending.done())
+            os.write(self.write_fd, b"po 90\n")
+            return await asyncio.wait_for(pending, 2)
+
+        with patch('sys.stdin', self.stdin), patch('sys.stdout'):
+            self.assertEqual(asyncio.run(read()), "tempo 90")
+
+    def test_eof(self):
+        os.write(self.write_fd, b"exit")
+        os.close(self.write_fd)
+        self.assertEqual(self._read_lines(1), ["exit"])
+        with self.assertRaises(EOFError):
+            self._read_lines(1)
+
+
+if __name__ == '__main__':
+    unittest.main()